@@ -23,22 +23,34 @@ max_pages = st.text_input("Max Pages to Crawl", str(crawler.MAX_CRAWL))
 keywords_input = st.text_input("Keywords (comma separated)", ",".join(crawler.KEYWORDS))
 
 def reset_crawler():
-    crawler.high_priority_queue = crawler.Queue()
-    crawler.low_priority_queue = crawler.Queue()
-    crawler.visited_urls = set()
+    crawler.open_frontier(resume=False)
+    crawler.visited_urls = crawler.new_visited_filter()
     crawler.all_pages = set()
+    crawler.all_pages_urls = set()
     crawler.all_images = set()
     crawler.all_links_found = set()
     crawler.keyword_matches = {}
-    crawler.high_priority_queue.put(crawler.TARGET_URL)
+    crawler.can_fetch_cached.cache_clear()
+
+@st.cache_data(show_spinner=False)
+def load_csv(path, mtime):
+    return pd.read_csv(path)
+
+@st.cache_data(show_spinner=False)
+def file_bytes(path, mtime):
+    with open(path, 'rb') as f:
+        return f.read()
 
 def create_zip():
     zip_buffer = io.BytesIO()
-    with zipfile.ZipFile(zip_buffer, 'w', zipfile.ZIP_DEFLATED) as zip_file:
+    with zipfile.ZipFile(zip_buffer, 'w', zipfile.ZIP_DEFLATED, compresslevel=1) as zip_file:
         for filename in ['pages.csv', 'images.csv', 'keyword_matches.csv', 'all_links.csv']:
             file_path = os.path.join("crawler_output", filename)
             if os.path.exists(file_path):
-                zip_file.write(file_path, arcname=filename)
+                zip_file.writestr(filename, file_bytes(file_path, os.path.getmtime(file_path)))
+        jsonl_path = os.path.join("crawler_output", 'keyword_matches.jsonl')
+        if crawler.keyword_matches and os.path.exists(jsonl_path):
+            zip_file.writestr('keyword_matches.jsonl', file_bytes(jsonl_path, os.path.getmtime(jsonl_path)))
     zip_buffer.seek(0)
     return zip_buffer
 
@@ -96,20 +108,20 @@ if st.session_state.get('crawl_complete', False):
     st.markdown("Or Download Individual Files")
     
     if os.path.exists("crawler_output/images.csv"):
-        df_images = pd.read_csv("crawler_output/images.csv")
+        images_mtime = os.path.getmtime("crawler_output/images.csv")
         st.download_button(
             label="Download Images Data",
-            data=df_images.to_csv(index=False).encode('utf-8'),
+            data=file_bytes("crawler_output/images.csv", images_mtime),
             file_name="images.csv",
             mime="text/csv",
             key="download_images"  
         )
     
     if os.path.exists("crawler_output/all_links.csv"):
-        df_links = pd.read_csv("crawler_output/all_links.csv")
+        links_mtime = os.path.getmtime("crawler_output/all_links.csv")
         st.download_button(
             label="Download Links Data",
-            data=df_links.to_csv(index=False).encode('utf-8'),
+            data=file_bytes("crawler_output/all_links.csv", links_mtime),
             file_name="all_links.csv",
             mime="text/csv",
             key="download_links"  
@@ -118,10 +130,11 @@ if st.session_state.get('crawl_complete', False):
         
     with st.expander("View keyword matched links"):
         if crawler.keyword_matches and os.path.exists("crawler_output/keyword_matches.csv"):
-            df_keywords = pd.read_csv("crawler_output/keyword_matches.csv")
+            keywords_mtime = os.path.getmtime("crawler_output/keyword_matches.csv")
+            df_keywords = load_csv("crawler_output/keyword_matches.csv", keywords_mtime)
             st.download_button(
                 label="Download Keyword Matches",
-                data=df_keywords.to_csv(index=False).encode('utf-8'),
+                data=file_bytes("crawler_output/keyword_matches.csv", keywords_mtime),
                 file_name="keyword_matches.csv",
                 mime="text/csv",
                 key="download_keywords"  
@@ -130,6 +143,6 @@ if st.session_state.get('crawl_complete', False):
 
     with st.expander("View pages links"):
         if os.path.exists("crawler_output/pages.csv"):
-            df_pages = pd.read_csv("crawler_output/pages.csv")
+            df_pages = load_csv("crawler_output/pages.csv", os.path.getmtime("crawler_output/pages.csv"))
             st.dataframe(df_pages)
         
@@ -1,174 +1,472 @@
 import requests
-from bs4 import BeautifulSoup
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
+from selectolax.lexbor import LexborHTMLParser
 import os
 from urllib.parse import urljoin, urlparse
-from tenacity import retry, stop_after_attempt, wait_exponential
-from queue import Queue
+import sqlite3
+from pybloom_live import ScalableBloomFilter
+from concurrent.futures import ThreadPoolExecutor, FIRST_COMPLETED, wait
 import csv
+from queue import Queue, Full
 import time
+import random
+import threading
 from urllib.robotparser import RobotFileParser
 from datetime import datetime
 import re 
+import functools
+import ahocorasick
+import orjson
+import codecs
 
 TARGET_URL = "http://books.toscrape.com"
 MAX_CRAWL = 5
 USER_AGENT = "Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/91.0.4472.124 Safari/537.36"
 DELAY = 1
+MAX_BYTES = 2_000_000
+MAX_WORKERS = 20
+MAX_PER_HOST = 4
+URL_KEYWORD_BONUS = 10
+FRONTIER_DB = os.path.join("crawler_output", "frontier.db")
+CHARSET_RE = re.compile(r'charset\s*=\s*["\']?([\w.:-]+)', re.I)
+META_CHARSET_RE = re.compile(rb'<meta[^>]+charset\s*=\s*["\']?([\w.:-]+)', re.I)
+_SKIP_EXT = frozenset({b'.pdf', b'.zip', b'.gz', b'.tar', b'.jpg', b'.jpeg', b'.png', b'.gif', b'.mp4',
+                       b'.mp3', b'.webm', b'.ico', b'.svg', b'.woff', b'.woff2', b'.css', b'.js'})
 KEYWORDS = []
 
-visited_urls = set()
+def new_visited_filter():
+    return ScalableBloomFilter(initial_capacity=100_000, error_rate=1e-4)
+
+visited_urls = new_visited_filter()
 all_pages = set()  
+all_pages_urls = set()
 all_images = set()  
 all_links_found = set()  
 keyword_matches = {} 
+keyword_automaton = None
+url_keyword_re = None
+
+OUTPUT_TABLES = {
+    'pages': ('pages.csv', 'csv', ['Title', 'URL', 'Timestamp']),
+    'images': ('images.csv', 'csv', ['Image URL', 'Alt Text', 'Page Title', 'Source URL', 'Timestamp', 'File Type']),
+    'all_links': ('all_links.csv', 'csv', ['Link URL', 'Link Text', 'Page Title', 'Source URL', 'Timestamp']),
+    'keyword_matches': ('keyword_matches.csv', 'csv', ['Page Title', 'URL', 'Keywords', 'Timestamp']),
+    'keyword_matches_jsonl': ('keyword_matches.jsonl', 'jsonl', None),
+}
+SENTINEL = None
+io_queue = None
+writer_thread = None
+writer_error = None
+
+host_next_ok = {}
+host_lock = threading.Lock()
+
+frontier_db = None
+
+def open_frontier(path=FRONTIER_DB, resume=True):
+    global frontier_db
+    if frontier_db is not None:
+        frontier_db.close()
+    os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+    frontier_db = sqlite3.connect(path, check_same_thread=False)
+    frontier_db.execute("PRAGMA journal_mode=WAL")
+    frontier_db.execute("PRAGMA synchronous=NORMAL")
+    frontier_db.execute(
+        "CREATE TABLE IF NOT EXISTS frontier "
+        "(url BLOB PRIMARY KEY, priority INTEGER, depth INTEGER, enqueued_at REAL, state INTEGER NOT NULL DEFAULT 0)"
+    )
+    columns = [row[1] for row in frontier_db.execute("PRAGMA table_info(frontier)")]
+    if 'state' not in columns:
+        frontier_db.execute("ALTER TABLE frontier ADD COLUMN state INTEGER NOT NULL DEFAULT 0")
+    frontier_db.execute("CREATE INDEX IF NOT EXISTS frontier_pending ON frontier (state, priority, enqueued_at)")
+    frontier_db.commit()
+    if not resume:
+        clear_frontier()
+    return frontier_db
+
+def clear_frontier():
+    db = get_frontier()
+    db.execute("DELETE FROM frontier")
+    db.commit()
+
+def get_frontier():
+    return frontier_db if frontier_db is not None else open_frontier()
+
+FRONTIER_PENDING, FRONTIER_IN_FLIGHT, FRONTIER_DONE = 0, 1, 2
+
+def enqueue_url(url, score=0, depth=0):
+    get_frontier().execute(
+        "INSERT INTO frontier (url, priority, depth, enqueued_at, state) VALUES (?, ?, ?, ?, ?) "
+        "ON CONFLICT(url) DO UPDATE SET "
+        "depth = CASE WHEN excluded.priority < priority THEN excluded.depth ELSE depth END, "
+        "priority = MIN(priority, excluded.priority) "
+        "WHERE state = ?",
+        (url, -score, depth, time.time(), FRONTIER_PENDING, FRONTIER_PENDING)
+    )
+
+def pop_frontier():
+    db = get_frontier()
+    row = db.execute(
+        "SELECT url, depth FROM frontier WHERE state = ? ORDER BY priority, enqueued_at LIMIT 1",
+        (FRONTIER_PENDING,)
+    ).fetchone()
+    if row is not None:
+        db.execute("UPDATE frontier SET state = ? WHERE url = ?", (FRONTIER_IN_FLIGHT, row[0]))
+    db.commit()
+    return row
+
+def finish_url(url, visited=True):
+    db = get_frontier()
+    if visited:
+        db.execute("UPDATE frontier SET state = ? WHERE url = ?", (FRONTIER_DONE, url))
+    else:
+        db.execute("DELETE FROM frontier WHERE url = ?", (url,))
+    db.commit()
+
+def has_pending_urls():
+    row = get_frontier().execute(
+        "SELECT 1 FROM frontier WHERE state IN (?, ?) LIMIT 1", (FRONTIER_PENDING, FRONTIER_IN_FLIGHT)
+    ).fetchone()
+    return row is not None
 
-high_priority_queue = Queue()
-low_priority_queue = Queue()
-high_priority_queue.put(TARGET_URL)
+def requeue_in_flight():
+    db = get_frontier()
+    db.execute("UPDATE frontier SET state = ? WHERE state = ?", (FRONTIER_PENDING, FRONTIER_IN_FLIGHT))
+    db.commit()
+
+def visited_from_frontier():
+    rows = get_frontier().execute("SELECT url FROM frontier WHERE state = ?", (FRONTIER_DONE,))
+    return [bytes(row[0]) for row in rows]
 
 session = requests.Session()
 session.headers.update({'User-Agent': USER_AGENT})
+retries = Retry(total=3, backoff_factor=2, status_forcelist=[429, 500, 502, 503, 504])
+adapter = HTTPAdapter(pool_connections=32, pool_maxsize=64, pool_block=False, max_retries=retries)
+session.mount('http://', adapter)
+session.mount('https://', adapter)
 
 rp = RobotFileParser()
 
 def load_robots_txt(base_url):
+    global rp
     robots_url = urljoin(base_url, '/robots.txt')
+    rp = RobotFileParser()
     rp.set_url(robots_url)
+    can_fetch_cached.cache_clear()
     try:
         rp.read()
     except Exception as e:
         print(f"Couldn't read robots.txt: {e}")
+        rp.allow_all = True
     return rp
 
 def can_fetch(url):
     return rp.can_fetch(USER_AGENT, url)
 
-@retry(stop=stop_after_attempt(3), wait=wait_exponential(multiplier=1, min=2, max=10))
+@functools.lru_cache(maxsize=100_000)
+def can_fetch_cached(url):
+    return can_fetch(url.decode('utf-8'))
+
 def fetch_url(url):
     try:
-        response = session.get(url, timeout=10)
+        response = session.get(url, timeout=10, stream=True)
         response.raise_for_status()
         return response
     except requests.exceptions.RequestException as e:
         print(f"Error fetching {url}: {e}")
+        if e.response is not None:
+            e.response.close()
         raise
 
-def is_same_domain(url, base_url):
-    return urlparse(url).netloc == urlparse(base_url).netloc
+@functools.lru_cache(maxsize=4096)
+def _parse(url):
+    return urlparse(url)
 
+@functools.lru_cache(maxsize=4096)
 def normalize_url(url):
-    parsed = urlparse(url)
-    return f"{parsed.scheme}://{parsed.netloc}{parsed.path}"
+    parsed = _parse(url)
+    return f"{parsed.scheme}://{parsed.netloc}{parsed.path}".encode('utf-8')
+
+def is_asset_url(url):
+    return os.path.splitext(_parse(url).path)[1].lower() in _SKIP_EXT
+
+def compile_keywords():
+    global keyword_automaton, url_keyword_re
+    if not KEYWORDS:
+        keyword_automaton = None
+        url_keyword_re = None
+        return
+    
+    variants = {}
+    for kw in KEYWORDS:
+        variants.setdefault(kw.lower(), set()).add(kw)
+    keyword_automaton = ahocorasick.Automaton()
+    for key, kws in variants.items():
+        keyword_automaton.add_word(key, frozenset(kws))
+    keyword_automaton.make_automaton()
+    url_keyword_re = re.compile('|'.join(f'/{re.escape(kw)}/' for kw in KEYWORDS).encode('utf-8'), re.I)
 
 def check_keywords(content):
-    content_lower = content.lower()
-    return [kw for kw in KEYWORDS if kw.lower() in content_lower]
+    if keyword_automaton is None:
+        return []
+    hits = set()
+    for _, kws in keyword_automaton.iter(content.lower()):
+        hits.update(kws)
+    return [kw for kw in KEYWORDS if kw in hits]
 
-def extract_links_and_images(soup, base_url):
+def extract_links_and_images(tree, base_url, source_url, page_title, timestamp):
     links = set()
     images = set()
+    base_netloc = _parse(base_url).netloc
     
-    for link in soup.find_all('a', href=True):
-        url = link['href'].strip()
+    for link in tree.css('a[href]'):
+        url = (link.attributes['href'] or '').strip()
         if url and not url.startswith(('javascript:', '#')):
             absolute_url = urljoin(base_url, url)
-            absolute_url = normalize_url(absolute_url)
-            if is_same_domain(absolute_url, base_url):
-                link_text = link.get_text(strip=True) or "No link text"
-                links.add((absolute_url, link_text))
+            if _parse(absolute_url).netloc == base_netloc:
+                link_text = link.text(strip=True) or "No link text"
+                links.add((normalize_url(absolute_url), link_text))
     
-    for img in soup.find_all('img', src=True):
-        img_url = img['src'].strip()
+    for img in tree.css('img[src]'):
+        img_url = (img.attributes['src'] or '').strip()
         if img_url:
             absolute_img_url = urljoin(base_url, img_url)
-            images.add(absolute_img_url)
+            img_alt = img.attributes.get('alt', 'No alt text')
+            images.add((absolute_img_url, img_alt, page_title, source_url, timestamp))
     
     return links, images
 
+def wait_for_host(url):
+    host = _parse(url).netloc
+    with host_lock:
+        now = time.monotonic()
+        start = max(now, host_next_ok.get(host, 0))
+        host_next_ok[host] = start + DELAY + random.uniform(0, 0.5)
+    if start > now:
+        time.sleep(start - now)
+
+def detect_encoding(content_type, body):
+    for match in (CHARSET_RE.search(content_type), META_CHARSET_RE.search(body[:1024])):
+        if match is None:
+            continue
+        encoding = match.group(1)
+        if isinstance(encoding, bytes):
+            encoding = encoding.decode('ascii')
+        try:
+            return codecs.lookup(encoding).name
+        except LookupError:
+            continue
+    return 'utf-8'
+
+def fetch_page(url):
+    wait_for_host(url)
+    response = fetch_url(url.decode('utf-8'))
+    timestamp = datetime.now().isoformat()
+    try:
+        content_type = response.headers.get('Content-Type', '')
+        is_html = content_type.lower().startswith('text/html')
+        body = response.raw.read(MAX_BYTES, decode_content=True) if is_html else None
+    finally:
+        response.close()
+    if body is None:
+        return None, timestamp
+    encoding = detect_encoding(content_type, body)
+    return LexborHTMLParser(body.decode(encoding, errors='replace')), timestamp
+
+def process_page(current_url, depth, tree, timestamp):
+    page_url = current_url.decode('utf-8')
+    title_node = tree.css_first('title')
+    page_title = (title_node.text(strip=True) if title_node else "") or "No Title"
+    
+    all_pages.add((current_url, page_title, timestamp))
+    all_pages_urls.add(current_url)
+    put_row('pages', [page_title, current_url, timestamp])
+    
+    new_links, new_images = extract_links_and_images(tree, page_url, current_url, page_title, timestamp)
+    for image in new_images - all_images:
+        img_url, alt, title, src_url, img_timestamp = image
+        file_type = os.path.splitext(img_url)[1][1:].upper() or "UNKNOWN"
+        put_row('images', [img_url, alt, title, src_url, img_timestamp, file_type])
+    all_images.update(new_images)
+    for link_url, link_text in new_links:
+        link = (link_url, link_text, page_title, current_url, timestamp)
+        if link not in all_links_found:
+            all_links_found.add(link)
+            put_row('all_links', list(link))
+    
+    text_content = tree.body.text(separator=' ', strip=True) if tree.body else ""
+    matched_keywords = check_keywords(text_content)
+    if matched_keywords:
+        keyword_matches[current_url] = {
+            'title': page_title,
+            'keywords': matched_keywords,
+            'timestamp': timestamp
+        }
+        put_row('keyword_matches', [page_title, current_url, ', '.join(matched_keywords), timestamp])
+        put_row('keyword_matches_jsonl', {'url': page_url, **keyword_matches[current_url]})
+        print(f"Found keywords {matched_keywords} in {page_url}")
+    
+    score = len(matched_keywords) - (depth + 1)
+    for link in new_links:
+        if link[0] not in visited_urls and link[0] not in all_pages_urls and not is_asset_url(link[0]):
+            if url_keyword_re and url_keyword_re.search(link[0]):
+                enqueue_url(link[0], score + URL_KEYWORD_BONUS, depth + 1)
+            else:
+                enqueue_url(link[0], score, depth + 1)
+
+def next_url(deferred):
+    if deferred:
+        return deferred.pop(0)
+    row = pop_frontier()
+    return (bytes(row[0]), row[1]) if row is not None else None
+
 def crawl():
     if not TARGET_URL:
         print("No target URL set for crawling.")
         return
     
     load_robots_txt(TARGET_URL)
-    crawl_count = 0
-    
-    while (not high_priority_queue.empty() or not low_priority_queue.empty()) and crawl_count < MAX_CRAWL:
-        current_url = high_priority_queue.get() if not high_priority_queue.empty() else low_priority_queue.get()
+    compile_keywords()
+    resuming = has_pending_urls()
+    if resuming:
+        requeue_in_flight()
+        for url in visited_from_frontier():
+            visited_urls.add(url)
+            all_pages_urls.add(url)
+    else:
+        clear_frontier()
+    enqueue_url(TARGET_URL.encode('utf-8'))
+    start_writer(append=resuming)
+    try:
+        crawl_count = 0
+        in_flight = {}
+        host_in_flight = {}
+        deferred = []
         
-        if current_url in visited_urls:
+        with ThreadPoolExecutor(max_workers=MAX_WORKERS) as executor:
+            while True:
+                while len(in_flight) < MAX_WORKERS and crawl_count + len(in_flight) < MAX_CRAWL:
+                    entry = next_url(deferred)
+                    if entry is None:
+                        break
+                    current_url, depth = entry
+                    if current_url in visited_urls:
+                        finish_url(current_url)
+                        continue
+                    if not can_fetch_cached(current_url):
+                        print(f"Disallowed by robots.txt: {current_url.decode('utf-8')}")
+                        visited_urls.add(current_url)
+                        finish_url(current_url)
+                        continue
+                    
+                    host = _parse(current_url).netloc
+                    if host_in_flight.get(host, 0) >= MAX_PER_HOST:
+                        deferred.append(entry)
+                        break
+                    
+                    print(f"Crawling {current_url.decode('utf-8')} ({crawl_count + len(in_flight) + 1}/{MAX_CRAWL})")
+                    host_in_flight[host] = host_in_flight.get(host, 0) + 1
+                    in_flight[executor.submit(fetch_page, current_url)] = entry
+                
+                if not in_flight:
+                    break
+                
+                done, _ = wait(in_flight, return_when=FIRST_COMPLETED)
+                for future in done:
+                    current_url, depth = in_flight.pop(future)
+                    host_in_flight[_parse(current_url).netloc] -= 1
+                    
+                    try:
+                        tree, timestamp = future.result()
+                        visited_urls.add(current_url)
+                        if tree is None:
+                            print(f"Skipped non-HTML {current_url.decode('utf-8')}")
+                        else:
+                            process_page(current_url, depth, tree, timestamp)
+                            crawl_count += 1
+                    except Exception as e:
+                        print(f"Failed to process {current_url.decode('utf-8')}: {str(e)}")
+                        if not writer_thread.is_alive():
+                            raise
+                    finally:
+                        finish_url(current_url, visited=current_url in visited_urls)
+    finally:
+        stop_writer()
+
+def writer_loop(queue, mode):
+    global writer_error
+    files = {}
+    writers = {}
+    
+    def open_table(table):
+        filename, fmt, headers = OUTPUT_TABLES[table]
+        path = os.path.join("crawler_output", filename)
+        if fmt == 'jsonl':
+            files[table] = open(path, mode + 'b')
+            return
+        f = open(path, mode, newline='', encoding='utf-8')
+        files[table] = f
+        writers[table] = csv.writer(f)
+        if f.tell() == 0:
+            writers[table].writerow(headers)
+    
+    try:
+        os.makedirs("crawler_output", exist_ok=True)
+        for table in ('pages', 'images', 'all_links'):
+            open_table(table)
+        while True:
+            item = queue.get()
+            if item is SENTINEL:
+                break
+            table, row = item
+            if table not in files:
+                open_table(table)
+            if OUTPUT_TABLES[table][1] == 'jsonl':
+                files[table].write(orjson.dumps(row) + b'\n')
+            else:
+                writers[table].writerow([v.decode('utf-8') if isinstance(v, bytes) else v for v in row])
+            if queue.empty():
+                for f in files.values():
+                    f.flush()
+    except Exception as e:
+        writer_error = e
+    finally:
+        for f in files.values():
+            f.close()
+
+def start_writer(append=False):
+    global io_queue, writer_thread, writer_error
+    writer_error = None
+    io_queue = Queue(maxsize=1000)
+    writer_thread = threading.Thread(target=writer_loop, args=(io_queue, 'a' if append else 'w'), daemon=True)
+    writer_thread.start()
+
+def put_row(table, row):
+    while True:
+        if writer_error is not None or not writer_thread.is_alive():
+            raise RuntimeError("CSV writer thread stopped") from writer_error
+        try:
+            io_queue.put((table, row), timeout=1)
+            return
+        except Full:
             continue
 
-        print(f"Crawling {current_url} ({crawl_count + 1}/{MAX_CRAWL})")
-        
+def stop_writer():
+    global io_queue, writer_thread
+    if writer_thread is None:
+        return
+    while writer_thread.is_alive():
         try:
-            response = fetch_url(current_url)
-            visited_urls.add(current_url)
-            
-            timestamp = datetime.now().isoformat()
-            soup = BeautifulSoup(response.content, 'html.parser')
-            page_title = soup.title.string.strip() if soup.title else "No Title"
-            
-            all_pages.add((current_url, page_title, timestamp))
-            
-            for img in soup.find_all('img', src=True):
-                img_url = urljoin(current_url, img['src'])
-                img_alt = img.get('alt', 'No alt text')
-                all_images.add((img_url, img_alt, page_title, current_url, timestamp))
-            
-            new_links, new_images = extract_links_and_images(soup, current_url)
-            for link_url, link_text in new_links:
-                all_links_found.add((link_url, link_text, page_title, current_url, timestamp))
-            
-            text_content = soup.get_text()
-            matched_keywords = check_keywords(text_content)
-            if matched_keywords:
-                keyword_matches[current_url] = {
-                    'title': page_title,
-                    'keywords': matched_keywords,
-                    'timestamp': timestamp
-                }
-                print(f"Found keywords {matched_keywords} in {current_url}")
-            
-            for link in new_links:
-                if link[0] not in visited_urls and not any(link[0] == url for url, _, _ in all_pages):
-                    if any(re.search(rf'/{kw}/', link[0], re.I) for kw in KEYWORDS):
-                        high_priority_queue.put(link[0])
-                    else:
-                        low_priority_queue.put(link[0])
-            
-            time.sleep(DELAY)
-            crawl_count += 1
-            
-        except Exception as e:
-            print(f"Failed to process {current_url}: {str(e)}")
+            io_queue.put(SENTINEL, timeout=1)
+            break
+        except Full:
             continue
+    writer_thread.join()
+    io_queue = None
+    writer_thread = None
 
 def save_results():
-    os.makedirs("crawler_output", exist_ok=True)
-    
-    with open(os.path.join("crawler_output", 'pages.csv'), 'w', newline='', encoding='utf-8') as f:
-        writer = csv.writer(f)
-        writer.writerow(['Title', 'URL', 'Timestamp'])
-        for url, title, timestamp in sorted(all_pages, key=lambda x: x[2], reverse=True):
-            writer.writerow([title, url, timestamp])
-    
-    with open(os.path.join("crawler_output", 'images.csv'), 'w', newline='', encoding='utf-8') as f:
-        writer = csv.writer(f)
-        writer.writerow(['Image URL', 'Alt Text', 'Page Title', 'Source URL', 'Timestamp', 'File Type'])
-        for img_url, alt, title, src_url, timestamp in sorted(all_images, key=lambda x: x[4], reverse=True):
-            file_type = os.path.splitext(img_url)[1][1:].upper() or "UNKNOWN"
-            writer.writerow([img_url, alt, title, src_url, timestamp, file_type])
-    
-    with open(os.path.join("crawler_output", 'all_links.csv'), 'w', newline='', encoding='utf-8') as f:
-        writer = csv.writer(f)
-        writer.writerow(['Link URL', 'Link Text', 'Page Title', 'Source URL', 'Timestamp'])
-        for link_url, link_text, page_title, source_url, timestamp in sorted(all_links_found, key=lambda x: x[4], reverse=True):
-            writer.writerow([link_url, link_text, page_title, source_url, timestamp])
-    
-    if keyword_matches:
-        with open(os.path.join("crawler_output", 'keyword_matches.csv'), 'w', newline='', encoding='utf-8') as f:
-            writer = csv.writer(f)
-            writer.writerow(['Page Title', 'URL', 'Keywords', 'Timestamp'])
-            for url, data in keyword_matches.items():
-                writer.writerow([data['title'], url, ', '.join(data['keywords']), data['timestamp']])
+    stop_writer()
+    if writer_error is not None:
+        raise writer_error